@@ -9,9 +9,14 @@ import json
 import threading
 import time
 from pathlib import Path
+import collections
+import concurrent.futures
 import queue
+import uuid
 import io
 import math
+from async_oss import AsyncBucket, AsyncOSSBackend
+from oss_upload import MULTIPART_PART_SIZE, MULTIPART_THRESHOLD, format_size, upload_file
 
 # 配置日志
 logging.basicConfig(
@@ -47,7 +52,14 @@ if not os.path.exists(config_file):
             'interval': 3600  # 默认每小时同步一次
         },
         'ignore_patterns': ['.git/', '.DS_Store', '*.tmp'],
-        'sync_status': 'stopped'
+        'sync_status': 'stopped',
+        'workers': 2,  # 同步工作线程数
+        'transfer': {
+            'backend': 'threaded',    # threaded: oss2阻塞调用；async: asyncio + aiohttp
+            'concurrency': 256,       # 异步后端的最大并发请求数
+            'signature_version': 'v1', # 异步后端的签名版本：v1 或 v4
+            'max_pending_mb': 64       # 异步后端已提交未完成文件的总大小上限
+        }
     }
     with open(config_file, 'w') as f:
         json.dump(default_config, f)
@@ -78,10 +90,37 @@ oss_access_key_id = os.environ.get('OSS_ACCESS_KEY_ID')
 oss_access_key_secret = os.environ.get('OSS_ACCESS_KEY_SECRET')
 oss_bucket_name = os.environ.get('OSS_BUCKET')
 oss_endpoint = os.environ.get('OSS_ENDPOINT')
+oss_region = os.environ.get('OSS_REGION')  # 可选，V4签名使用，默认从endpoint推断
 
-# 同步任务队列和锁
-sync_queue = queue.Queue()
+# 同步状态锁
 sync_lock = threading.Lock()
+# 日志文件锁
+logs_lock = threading.Lock()
+
+# 同步任务类型及默认优先级（数值越小越优先）
+JOB_PRIORITIES = {
+    'path': 10,        # 指定路径立即同步
+    'restore': 20,     # 从OSS恢复到宿主机
+    'incremental': 40, # 只同步上次同步后修改过的文件
+    'full': 50         # 扫描全部文件并与OSS比较
+}
+# 扫描整个宿主机目录的任务，会更新全局同步状态，同一时间只运行一个
+WHOLE_TREE_JOBS = ('full', 'incremental')
+# 定时触发的任务优先级低于手动触发
+SCHEDULED_PRIORITY_PENALTY = 10
+# 任务每等待该秒数，有效优先级提升1
+JOB_AGING_SECONDS = 30
+# 恢复文件时先下载到带该后缀的临时文件，完成后再替换，同步时忽略这类文件
+RESTORE_TEMP_SUFFIX = '.oss-restore.tmp'
+
+# 列举OSS文件时每页的数量（oss2.ObjectIterator默认值）
+LIST_PAGE_SIZE = 100
+# 每种传输后端保留的最近同步任务测量值数量
+THROUGHPUT_SAMPLES = 20
+# 不超过该大小的文件由异步后端提交后不等待结果，更大的文件逐个上传
+ASYNC_SUBMIT_THRESHOLD = 1024 * 1024
+# 异步上传结果的处理间隔（秒），期间完成的上传合并更新一次状态和日志
+ASYNC_FLUSH_SECONDS = 1
 
 # 初始化OSS客户端
 def get_oss_client():
@@ -93,6 +132,71 @@ def get_oss_client():
     bucket = oss2.Bucket(auth, oss_endpoint, oss_bucket_name)
     return auth, bucket
 
+# 异步传输后端（按配置创建，进程内共享）
+async_backend = None
+async_backend_settings = None
+async_backend_lock = threading.Lock()
+
+# 校验传输配置，缺少的项使用默认值，无效时抛出ValueError
+def parse_transfer_config(transfer):
+    if not isinstance(transfer, dict):
+        raise ValueError("传输配置必须是对象")
+    backend = transfer.get('backend', 'threaded')
+    if backend not in ('threaded', 'async'):
+        raise ValueError("传输后端只能是 threaded 或 async")
+    signature_version = transfer.get('signature_version', 'v1')
+    if signature_version not in ('v1', 'v4'):
+        raise ValueError("签名版本只能是 v1 或 v4")
+    parsed = {'backend': backend, 'signature_version': signature_version}
+    for name, default in (('concurrency', 256), ('max_pending_mb', 64)):
+        value = transfer.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"{name} 必须是不小于1的整数")
+        parsed[name] = value
+    return parsed
+
+# 根据配置返回上传使用的bucket，异步后端与oss2.Bucket接口兼容，用完后需调用release()
+def get_transfer_bucket(bucket, config):
+    global async_backend, async_backend_settings
+    # config.json 可能被手动修改，配置无效时使用线程传输
+    try:
+        transfer = parse_transfer_config(config.get('transfer', {}))
+    except ValueError as e:
+        add_log(f"传输配置无效，使用线程传输: {str(e)}", "error")
+        transfer = {'backend': 'threaded'}
+    if transfer['backend'] != 'async':
+        # 切换回线程传输时关闭异步后端（正在使用它的任务结束后关闭）
+        with async_backend_lock:
+            if async_backend is not None:
+                async_backend.retire()
+                async_backend = None
+                async_backend_settings = None
+        return bucket
+
+    settings = (
+        transfer['concurrency'],
+        transfer['signature_version'],
+        transfer['max_pending_mb'] * 1024 * 1024
+    )
+    with async_backend_lock:
+        if async_backend is None or async_backend_settings != settings:
+            try:
+                backend = AsyncOSSBackend(
+                    oss_access_key_id, oss_access_key_secret, oss_endpoint, oss_bucket_name,
+                    concurrency=settings[0], signature_version=settings[1], region=oss_region,
+                    max_pending_bytes=settings[2]
+                )
+            except (RuntimeError, ValueError) as e:
+                add_log(f"异步传输后端初始化失败，使用线程传输: {str(e)}", "error")
+                return bucket
+            # 配置变化时旧后端在正在使用它的任务结束后关闭
+            if async_backend is not None:
+                async_backend.retire()
+            async_backend = backend
+            async_backend_settings = settings
+        async_backend.acquire()
+    return AsyncBucket(bucket, async_backend)
+
 # 添加日志记录
 def add_log(message, level='info'):
     log_entry = {
@@ -101,19 +205,20 @@ def add_log(message, level='info'):
         'level': level
     }
     
-    logs = []
-    if os.path.exists(logs_file):
-        with open(logs_file, 'r') as f:
-            try:
-                logs = json.load(f)
-            except json.JSONDecodeError:
-                logs = []
-    
-    logs.insert(0, log_entry)
-    logs = logs[:100]  # 保留最近的100条日志
-    
-    with open(logs_file, 'w') as f:
-        json.dump(logs, f)
+    with logs_lock:
+        logs = []
+        if os.path.exists(logs_file):
+            with open(logs_file, 'r') as f:
+                try:
+                    logs = json.load(f)
+                except json.JSONDecodeError:
+                    logs = []
+        
+        logs.insert(0, log_entry)
+        logs = logs[:100]  # 保留最近的100条日志
+        
+        with open(logs_file, 'w') as f:
+            json.dump(logs, f)
     
     if level == 'error':
         logger.error(message)
@@ -122,7 +227,8 @@ def add_log(message, level='info'):
 
 # 更新同步状态
 def update_sync_status(is_syncing=None, total_files=None, processed_files=None, current_file=None, 
-                      network_speed=None, total_bytes=None):
+                      network_speed=None, total_bytes=None, last_completed_sync=None,
+                      throughput=None):
     with sync_lock:
         status = {}
         if os.path.exists(status_file):
@@ -187,19 +293,15 @@ def update_sync_status(is_syncing=None, total_files=None, processed_files=None,
                 if elapsed_seconds > 0:
                     status['network']['avg_speed'] = total_bytes / elapsed_seconds
         
+        if last_completed_sync is not None:
+            status['last_completed_sync'] = last_completed_sync
+        
+        if throughput is not None:
+            status['throughput'] = throughput
+        
         with open(status_file, 'w') as f:
             json.dump(status, f)
 
-# 格式化大小
-def format_size(bytes, suffix="B"):
-    if bytes == 0:
-        return "0 " + suffix
-    size_name = ("", "K", "M", "G", "T", "P", "E", "Z", "Y")
-    i = int(math.floor(math.log(bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(bytes / p, 2)
-    return f"{s} {size_name[i]}{suffix}"
-
 # 计算文件总数
 def count_files(directory, ignore_patterns):
     count = 0
@@ -210,6 +312,8 @@ def count_files(directory, ignore_patterns):
             
         for file in files:
             # 检查是否需要忽略当前文件
+            if file.endswith(RESTORE_TEMP_SUFFIX):
+                continue
             if any(Path(file).match(pattern) for pattern in ignore_patterns if '*' in pattern):
                 continue
             count += 1
@@ -277,203 +381,715 @@ class BandwidthMonitoringStream(io.IOBase):
     def __getattr__(self, attr):
         return getattr(self.original_stream, attr)
 
-# 同步文件到OSS（后台线程函数）
-def sync_worker():
-    while True:
+# 任务无需执行时抛出，任务状态记为skipped
+class JobSkipped(Exception):
+    pass
+
+# 同步任务
+class SyncJob:
+    def __init__(self, job_type, path='/', priority=None, source='manual'):
+        self.id = uuid.uuid4().hex[:12]
+        self.type = job_type
+        self.path = '/' + path.strip('/')
+        self.priority = JOB_PRIORITIES[job_type] if priority is None else priority
+        self.source = source
+        self.state = 'pending'
+        self.cancelled = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.total_files = 0
+        self.processed_files = 0
+        self.total_bytes = 0
+        self.failed_files = 0
+        self.error = None
+
+    # 去重键：类型和路径都相同的任务视为等价任务
+    @property
+    def key(self):
+        return (self.type, self.path)
+
+    # 两个任务处理的路径是否有重叠（全量扫描类任务覆盖整个目录）
+    def overlaps(self, other):
+        if self.type in WHOLE_TREE_JOBS or other.type in WHOLE_TREE_JOBS:
+            return True
+        a, b = self.path.rstrip('/') + '/', other.path.rstrip('/') + '/'
+        return a.startswith(b) or b.startswith(a)
+
+    # 有效优先级：等待越久优先级越高，避免低优先级任务饿死
+    def effective_priority(self, now):
+        return self.priority - (now - self.created_at) / JOB_AGING_SECONDS
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'path': self.path,
+            'priority': self.priority,
+            'source': self.source,
+            'state': self.state,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'total_files': self.total_files,
+            'processed_files': self.processed_files,
+            'total_bytes': self.total_bytes,
+            'failed_files': self.failed_files,
+            'error': self.error
+        }
+
+# 同步任务调度器：按优先级分发任务到工作线程池
+class JobScheduler:
+    def __init__(self, runner):
+        self._runner = runner
+        self._cond = threading.Condition()
+        self._pending = []
+        self._running = {}
+        self._history = collections.deque(maxlen=50)
+        self._workers = []
+        self._idle = 0
+
+    def start(self, num_workers):
+        for i in range(max(1, num_workers)):
+            worker = threading.Thread(target=self._worker_loop, name=f'sync-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    # 提交任务，返回 (任务, 是否为新任务)
+    def submit(self, job_type, path='/', priority=None, source='manual'):
+        job = SyncJob(job_type, path, priority, source)
+        with self._cond:
+            existing = self._find_equivalent_locked(job)
+            if existing is not None:
+                # 合并等价任务，保留更高的优先级
+                existing.priority = min(existing.priority, job.priority)
+                return existing, False
+            self._pending.append(job)
+            self._cond.notify()
+        return job, True
+
+    def _find_equivalent_locked(self, job):
+        for pending in self._pending:
+            if pending.key == job.key:
+                return pending
+            # 已排队的全量同步覆盖增量同步
+            if job.type == 'incremental' and pending.type == 'full':
+                return pending
+            if job.type == 'full' and pending.type == 'incremental':
+                pending.type = 'full'
+                return pending
+        # 定时任务不在同类任务运行期间重复排队
+        if job.source == 'schedule':
+            for running in self._running.values():
+                if running.type in WHOLE_TREE_JOBS and job.type in WHOLE_TREE_JOBS:
+                    return running
+        return None
+
+    def _whole_tree_running_locked(self):
+        return any(job.type in WHOLE_TREE_JOBS for job in self._running.values())
+
+    # 取出满足条件且有效优先级最高的任务
+    def _pop_locked(self, accept):
+        now = time.time()
+        candidates = [job for job in self._pending if accept(job)]
+        if not candidates:
+            return None
+        job = min(candidates, key=lambda j: (j.effective_priority(now), j.created_at))
+        self._pending.remove(job)
+        self._running[job.id] = job
+        return job
+
+    def _can_start_locked(self, job):
+        # 同一时间只运行一个全量扫描类任务
+        if job.type in WHOLE_TREE_JOBS and self._whole_tree_running_locked():
+            return False
+        # 恢复任务与路径重叠的其他任务互斥，避免上传恢复到一半的文件
+        for running in self._running.values():
+            if (job.type == 'restore' or running.type == 'restore') and job.overlaps(running):
+                return False
+        return True
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._pop_locked(self._can_start_locked)
+                while job is None:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    job = self._pop_locked(self._can_start_locked)
+            self._execute(job)
+
+    def _execute(self, job):
+        job.state = 'running'
+        job.started_at = time.time()
         try:
-            # 从队列获取任务，如果没有任务则阻塞等待
-            task = sync_queue.get(block=True)
-            
-            # 检查是否是退出信号
-            if task == "EXIT":
-                break
-            
-            # 开始同步任务
-            add_log("开始同步任务")
-            sync_to_oss_task()
-            
+            self._runner(job)
+            job.state = 'cancelled' if job.cancelled else 'done'
+        except JobSkipped as e:
+            job.state = 'skipped'
+            job.error = str(e)
+            add_log(f"跳过同步任务 {job.type} {job.path}: {str(e)}")
         except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
             add_log(f"同步任务出错: {str(e)}", "error")
         finally:
-            # 标记任务完成
-            sync_queue.task_done()
+            job.finished_at = time.time()
+            with self._cond:
+                self._running.pop(job.id, None)
+                self._history.appendleft(job)
+                self._cond.notify_all()
+
+    # 在长时间运行的全量任务中调用：没有空闲工作线程时，就地执行更高优先级的路径同步任务
+    def run_urgent(self, current):
+        while True:
+            with self._cond:
+                if self._idle > 0:
+                    return
+                job = self._pop_locked(
+                    lambda j: j.type == 'path' and j.priority < current.priority and self._can_start_locked(j)
+                )
+            if job is None:
+                return
+            add_log(f"优先执行任务 {job.type}: {job.path}")
+            self._execute(job)
+
+    # 取消所有排队和运行中的任务
+    def cancel_all(self):
+        with self._cond:
+            for job in self._pending:
+                job.cancelled = True
+                job.state = 'cancelled'
+                job.finished_at = time.time()
+                self._history.appendleft(job)
+            self._pending = []
+            for job in self._running.values():
+                job.cancelled = True
+
+    def snapshot(self):
+        with self._cond:
+            now = time.time()
+            pending = sorted(self._pending, key=lambda j: (j.effective_priority(now), j.created_at))
+            return {
+                'pending': [job.to_dict() for job in pending],
+                'running': [job.to_dict() for job in self._running.values()],
+                'history': [job.to_dict() for job in self._history]
+            }
+
+# 将请求路径解析为/host_files下的绝对路径，越界时返回None
+def resolve_host_path(path):
+    host_dir = '/host_files'
+    full_path = os.path.normpath(os.path.join(host_dir, path.lstrip('/')))
+    if full_path != host_dir and not full_path.startswith(host_dir + os.sep):
+        return None
+    return full_path
+
+# 遍历目录下需要同步的文件，返回 (本地路径, OSS key)
+def iter_sync_files(base_dir, ignore_patterns, host_dir='/host_files'):
+    if os.path.isfile(base_dir):
+        yield base_dir, os.path.relpath(base_dir, host_dir).replace('\\', '/')
+        return
+
+    for root, dirs, files in os.walk(base_dir):
+        # 检查是否需要忽略当前目录
+        if any(Path(root).match(pattern) for pattern in ignore_patterns if '*' not in pattern):
+            continue
+
+        for file in files:
+            # 检查是否需要忽略当前文件
+            if file.endswith(RESTORE_TEMP_SUFFIX):
+                continue
+            if any(Path(file).match(pattern) for pattern in ignore_patterns if '*' in pattern):
+                continue
+
+            local_path = os.path.join(root, file)
+            # 计算相对路径作为OSS的key
+            yield local_path, os.path.relpath(local_path, host_dir).replace('\\', '/')
+
+# 计算目录对应的OSS前缀
+def get_remote_prefix(base_dir, host_dir='/host_files'):
+    prefix = os.path.relpath(base_dir, host_dir).replace('\\', '/')
+    if prefix == '.':
+        return ''
+    if os.path.isdir(base_dir):
+        prefix += '/'
+    return prefix
+
+# 获取OSS上已有的文件列表，返回 {key: 大小}
+# 不以/结尾的前缀表示单个文件，只保留同名的key，避免匹配到 docsX、docs-old/ 等同名开头的对象
+def list_remote_objects(bucket, prefix=''):
+    existing_objects = {}
+    for obj in oss2.ObjectIterator(bucket, prefix=prefix, max_keys=LIST_PAGE_SIZE):
+        if prefix and not prefix.endswith('/') and obj.key != prefix:
+            continue
+        existing_objects[obj.key] = obj.size
+    return existing_objects
+
+# 最近同步任务的整体测量值 {传输后端: [[上传字节数, 请求数, 耗时秒数], ...]}，用于估算同步耗时
+throughput_lock = threading.Lock()
+throughput_samples = {}
+
+def load_throughput_stats():
+    try:
+        with open(status_file, 'r') as f:
+            saved = json.load(f).get('throughput') or {}
+    except (json.JSONDecodeError, FileNotFoundError):
+        saved = {}
+    with throughput_lock:
+        for backend, samples in saved.items():
+            if isinstance(samples, list):
+                throughput_samples[backend] = samples[-THROUGHPUT_SAMPLES:]
+
+# 记录一个同步任务从列举OSS到上传结束的整体测量值，返回全部测量值
+def record_throughput(backend, uploaded_bytes, requests, seconds):
+    with throughput_lock:
+        samples = throughput_samples.setdefault(backend, [])
+        samples.append([uploaded_bytes, requests, seconds])
+        del samples[:-THROUGHPUT_SAMPLES]
+        return {name: list(values) for name, values in throughput_samples.items()}
+
+# 用最近的测量值拟合 耗时 = 每字节耗时 × 字节数 + 每请求耗时 × 请求数
+def fit_throughput_model(backend):
+    with throughput_lock:
+        samples = list(throughput_samples.get(backend, []))
+    model = {'samples': len(samples), 'seconds_per_byte': None, 'seconds_per_request': None}
+
+    s_bb = sum(b * b for b, r, w in samples)
+    s_rr = sum(r * r for b, r, w in samples)
+    s_br = sum(b * r for b, r, w in samples)
+    s_bw = sum(b * w for b, r, w in samples)
+    s_rw = sum(r * w for b, r, w in samples)
+
+    det = s_bb * s_rr - s_br * s_br
+    if det > 1e-9 * s_bb * s_rr:
+        per_byte = (s_bw * s_rr - s_rw * s_br) / det
+        per_request = (s_rw * s_bb - s_bw * s_br) / det
+        if per_byte >= 0 and per_request >= 0:
+            model['seconds_per_byte'] = per_byte
+            model['seconds_per_request'] = per_request
+            return model
+
+    # 测量值太少或无法区分两项时，分别按字节数和请求数单独拟合，估算时取较大值
+    model['fallback'] = {
+        'seconds_per_byte': s_bw / s_bb if s_bb else None,
+        'seconds_per_request': s_rw / s_rr if s_rr else None
+    }
+    return model
+
+def estimate_duration(model, upload_bytes, requests):
+    if model['seconds_per_byte'] is not None:
+        return model['seconds_per_byte'] * upload_bytes + model['seconds_per_request'] * requests
+    fallback = model.get('fallback') or {}
+    estimates = []
+    if fallback.get('seconds_per_byte') is not None:
+        estimates.append(fallback['seconds_per_byte'] * upload_bytes)
+    if fallback.get('seconds_per_request') is not None:
+        estimates.append(fallback['seconds_per_request'] * requests)
+    return max(estimates) if estimates else None
+
+# 执行同步任务（工作线程入口）
+def run_sync_job(job):
+    add_log(f"开始同步任务: {job.type} {job.path}")
+    if job.type == 'restore':
+        restore_from_oss_task(job)
+    else:
+        sync_to_oss_task(job)
 
 # 同步文件到OSS（具体任务实现）
-def sync_to_oss_task():
+def sync_to_oss_task(job):
+    # 全量扫描类任务更新全局同步状态，路径任务只记录在任务自身
+    whole_tree = job.type in WHOLE_TREE_JOBS
+    # 异步后端已提交、尚未统计的上传 {future: (OSS key, 文件大小)}
+    pending_uploads = {}
+    bucket = None
     try:
         with open(config_file, 'r') as f:
             config = json.load(f)
-        
-        if config.get('sync_status') != 'running':
-            return
-        
+
+        if whole_tree and config.get('sync_status') != 'running':
+            raise JobSkipped("同步已停止")
+
         auth, bucket = get_oss_client()
         if not bucket:
-            add_log("OSS客户端初始化失败", "error")
-            update_sync_status(is_syncing=False)
-            return
-        
+            raise RuntimeError("OSS客户端初始化失败")
+
+        bucket = get_transfer_bucket(bucket, config)
+
         host_dir = '/host_files'
+        base_dir = resolve_host_path(job.path)
+        if base_dir is None or not os.path.exists(base_dir):
+            raise FileNotFoundError(f"同步路径不存在: {job.path}")
         ignore_patterns = config.get('ignore_patterns', [])
-        
-        add_log(f"开始同步: {host_dir} -> OSS")
-        update_sync_status(is_syncing=True)
-        
+
+        # 增量同步只上传上次成功同步之后修改过的文件，不需要列举OSS
+        modified_since = None
+        if job.type == 'incremental':
+            modified_since = get_last_completed_sync()
+            if modified_since is None:
+                add_log("未找到上次同步记录，增量同步按全量执行")
+
+        add_log(f"开始同步: {base_dir} -> OSS")
+        if whole_tree:
+            update_sync_status(is_syncing=True)
+
         # 计算文件总数
-        total_files = count_files(host_dir, ignore_patterns)
-        update_sync_status(total_files=total_files, processed_files=0)
-        add_log(f"找到 {total_files} 个文件需要同步")
-        
+        if os.path.isfile(base_dir):
+            job.total_files = 1
+        else:
+            job.total_files = count_files(base_dir, ignore_patterns)
+        if whole_tree:
+            update_sync_status(total_files=job.total_files, processed_files=0)
+        add_log(f"找到 {job.total_files} 个文件需要同步")
+
+        # 从列举OSS开始统计请求数和耗时，用于估算以后的同步耗时（不含插队执行的路径任务）
+        transfer_started = time.time()
+        urgent_seconds = 0
+        request_count = 0
+
         # 获取OSS上已有的文件列表
-        add_log("获取OSS上已有的文件列表")
         existing_objects = {}
-        for obj in oss2.ObjectIterator(bucket):
-            existing_objects[obj.key] = obj.etag
-        
+        if modified_since is None:
+            add_log("获取OSS上已有的文件列表")
+            existing_objects = list_remote_objects(bucket, get_remote_prefix(base_dir, host_dir))
+            request_count += max(1, math.ceil(len(existing_objects) / LIST_PAGE_SIZE))
+
+        def on_progress(transferred, speed):
+            job.total_bytes += transferred
+            if whole_tree:
+                update_sync_status(network_speed=speed, total_bytes=job.total_bytes)
+
+        # 异步后端：小文件提交后不等待结果，直接处理下一个文件。
+        # 完成回调在事件循环线程中执行，只把结果放入队列，由当前同步线程处理
+        completed_uploads = queue.Queue()
+        last_flush = time.time()
+
+        def submit_upload(local_path, oss_key, file_size):
+            future = bucket.submit_put_file(oss_key, local_path, file_size)
+            pending_uploads[future] = (oss_key, file_size)
+            future.add_done_callback(completed_uploads.put)
+
+        # 统计一批已完成的异步上传，合并写入一次状态和日志
+        def account_uploads(futures, elapsed):
+            uploaded = 0
+            uploaded_bytes = 0
+            cancelled = 0
+            for future in futures:
+                oss_key, file_size = pending_uploads.pop(future)
+                if future.cancelled():
+                    cancelled += 1
+                elif future.exception() is not None:
+                    job.failed_files += 1
+                    add_log(f"上传文件 {oss_key} 失败: {str(future.exception())}", "error")
+                else:
+                    uploaded += 1
+                    uploaded_bytes += file_size
+
+            if cancelled:
+                add_log(f"已取消 {cancelled} 个未完成的上传")
+
+            if uploaded:
+                job.total_bytes += uploaded_bytes
+                speed = uploaded_bytes / elapsed if elapsed > 0 else 0
+                add_log(f"异步上传完成 {uploaded} 个文件，共 {format_size(uploaded_bytes)}")
+                if whole_tree:
+                    update_sync_status(network_speed=speed, total_bytes=job.total_bytes)
+
+        def flush_completed_uploads():
+            nonlocal last_flush
+            now = time.time()
+            if now - last_flush < ASYNC_FLUSH_SECONDS:
+                return
+            futures = []
+            while True:
+                try:
+                    future = completed_uploads.get_nowait()
+                except queue.Empty:
+                    break
+                if future in pending_uploads:
+                    futures.append(future)
+            account_uploads(futures, now - last_flush)
+            last_flush = now
+
         # 同步文件
-        processed_files = 0
-        total_bytes_transferred = 0
-        
-        for root, dirs, files in os.walk(host_dir):
-            # 检查是否需要忽略当前目录
-            if any(Path(root).match(pattern) for pattern in ignore_patterns if '*' not in pattern):
-                continue
-                
-            for file in files:
-                # 检查是否需要忽略当前文件
-                if any(Path(file).match(pattern) for pattern in ignore_patterns if '*' in pattern):
-                    continue
-                
-                # 检查同步是否被停止
+        for local_path, oss_key in iter_sync_files(base_dir, ignore_patterns, host_dir):
+            # 检查同步是否被停止
+            if whole_tree:
                 with open(config_file, 'r') as f:
                     current_config = json.load(f)
                 if current_config.get('sync_status') != 'running':
-                    add_log("同步任务被手动停止")
-                    update_sync_status(is_syncing=False)
-                    return
-                
-                local_path = os.path.join(root, file)
-                # 计算相对路径作为OSS的key
-                oss_key = os.path.relpath(local_path, host_dir).replace('\\', '/')
-                
-                # 更新当前处理的文件
-                update_sync_status(current_file=oss_key, processed_files=processed_files)
-                
-                # 检查文件是否已经存在于OSS
-                file_stat = os.stat(local_path)
-                file_size = file_stat.st_size
-                
-                should_upload = True
-                if oss_key in existing_objects:
-                    try:
-                        # 实现更精确的文件比较
-                        head = bucket.head_object(oss_key)
-                        if head.content_length == file_size:
-                            should_upload = False
-                            add_log(f"跳过相同文件: {oss_key}")
-                    except oss2.exceptions.NoSuchKey:
-                        pass  # 文件不存在，需要上传
-                
-                if should_upload:
-                    try:
-                        # 使用分片上传来处理大文件
-                        if file_size > 10 * 1024 * 1024:  # 超过10MB使用分片上传
-                            add_log(f"开始分片上传大文件: {oss_key}")
-                            
-                            # 初始化分片上传
-                            upload_id = bucket.init_multipart_upload(oss_key).upload_id
-                            parts = []
-                            
-                            # 分片大小5MB
-                            part_size = 5 * 1024 * 1024
-                            num_parts = (file_size + part_size - 1) // part_size
-                            
-                            with open(local_path, 'rb') as f:
-                                for i in range(num_parts):
-                                    # 记录开始时间
-                                    start_time = time.time()
-                                    
-                                    # 读取分片数据
-                                    data = f.read(part_size)
-                                    part_bytes = len(data)
-                                    
-                                    # 上传分片
-                                    result = bucket.upload_part(oss_key, upload_id, i + 1, data)
-                                    parts.append(oss2.models.PartInfo(i + 1, result.etag))
-                                    
-                                    # 记录结束时间并计算速度
-                                    end_time = time.time()
-                                    elapsed = end_time - start_time
-                                    if elapsed > 0:
-                                        speed = part_bytes / elapsed
-                                        total_bytes_transferred += part_bytes
-                                        update_sync_status(
-                                            network_speed=speed,
-                                            total_bytes=total_bytes_transferred
-                                        )
-                                        
-                                        # 记录日志
-                                        formatted_speed = format_size(speed) + "/s"
-                                        progress = (i + 1) / num_parts * 100
-                                        add_log(f"分片上传 {oss_key} 进度: {progress:.1f}%, 速度: {formatted_speed}")
-                                    
-                            # 完成分片上传
-                            bucket.complete_multipart_upload(oss_key, upload_id, parts)
-                            add_log(f"完成分片上传: {oss_key}")
-                        else:
-                            # 小文件上传 - 使用简单方法而不是带宽监控
-                            try:
-                                with open(local_path, 'rb') as f:
-                                    # 记录开始时间
-                                    start_time = time.time()
-                                    
-                                    # 直接上传文件
-                                    bucket.put_object(oss_key, f)
-                                    
-                                    # 记录结束时间并计算速度
-                                    end_time = time.time()
-                                    elapsed = end_time - start_time
-                                    
-                                    if elapsed > 0:
-                                        speed = file_size / elapsed
-                                        total_bytes_transferred += file_size
-                                        update_sync_status(
-                                            network_speed=speed,
-                                            total_bytes=total_bytes_transferred
-                                        )
-                                
-                                add_log(f"上传文件: {oss_key}")
-                            except Exception as e:
-                                add_log(f"上传文件 {oss_key} 失败: {str(e)}", "error")
-                    except Exception as e:
-                        add_log(f"上传文件 {oss_key} 失败: {str(e)}", "error")
-                
-                processed_files += 1
-                update_sync_status(processed_files=processed_files)
-        
-        # 确保网络统计最终准确
-        update_sync_status(
-            is_syncing=False,
-            processed_files=processed_files,
-            total_bytes=total_bytes_transferred
-        )
-        
-        add_log(f"同步完成，共处理 {processed_files} 个文件，传输总量: {format_size(total_bytes_transferred)}")
-    except Exception as e:
-        add_log(f"同步过程出错: {str(e)}", "error")
-        update_sync_status(is_syncing=False)
+                    job.cancelled = True
+            if job.cancelled:
+                break
+
+            # 让路径同步等高优先级任务插队执行
+            if whole_tree:
+                urgent_started = time.time()
+                job_scheduler.run_urgent(job)
+                urgent_seconds += time.time() - urgent_started
+
+            flush_completed_uploads()
+
+            # 更新当前处理的文件
+            if whole_tree:
+                update_sync_status(current_file=oss_key, processed_files=job.processed_files)
+
+            # 检查文件是否已经存在于OSS
+            file_stat = os.stat(local_path)
+            file_size = file_stat.st_size
+
+            should_upload = True
+            if modified_since is not None:
+                # mv或解压保留原修改时间时mtime不变，但ctime会更新
+                if max(file_stat.st_mtime, file_stat.st_ctime) < modified_since:
+                    should_upload = False
+            elif oss_key in existing_objects:
+                try:
+                    # 实现更精确的文件比较
+                    request_count += 1
+                    head = bucket.head_object(oss_key)
+                    if head.content_length == file_size:
+                        should_upload = False
+                        add_log(f"跳过相同文件: {oss_key}")
+                except oss2.exceptions.NoSuchKey:
+                    pass  # 文件不存在，需要上传
+
+            if should_upload:
+                # 分片上传额外需要初始化和完成两次请求
+                if file_size > MULTIPART_THRESHOLD:
+                    request_count += math.ceil(file_size / MULTIPART_PART_SIZE) + 2
+                else:
+                    request_count += 1
+                try:
+                    if file_size <= ASYNC_SUBMIT_THRESHOLD and hasattr(bucket, 'submit_put_file'):
+                        submit_upload(local_path, oss_key, file_size)
+                    else:
+                        upload_file(bucket, local_path, oss_key, file_size, on_progress, add_log)
+                except Exception as e:
+                    job.failed_files += 1
+                    add_log(f"上传文件 {oss_key} 失败: {str(e)}", "error")
+
+            job.processed_files += 1
+            if whole_tree:
+                update_sync_status(processed_files=job.processed_files)
+
+        # 停止时取消尚未完成的异步上传
+        if job.cancelled:
+            for future in pending_uploads:
+                future.cancel()
+
+        # 等待异步上传全部完成后直接根据结果统计，不依赖完成回调的执行时机
+        if pending_uploads:
+            futures = list(pending_uploads)
+            concurrent.futures.wait(futures)
+            account_uploads(futures, time.time() - last_flush)
+
+        if job.cancelled:
+            add_log("同步任务被手动停止")
+            if whole_tree:
+                update_sync_status(is_syncing=False, total_bytes=job.total_bytes)
+            return
+
+        # 记录本次任务的整体字节数、请求数和耗时。增量同步大部分时间用于遍历本地文件，
+        # 几乎不发请求，会使估算的每请求耗时偏大，只记录每个文件都对应OSS请求的全量和路径同步
+        throughput = None
+        if modified_since is None and request_count:
+            throughput = record_throughput(
+                'async' if isinstance(bucket, AsyncBucket) else 'threaded',
+                job.total_bytes, request_count, time.time() - transfer_started - urgent_seconds
+            )
+
+        # 确保网络统计最终准确；有文件上传失败时不推进增量同步时间点，下次增量同步会重试这些文件
+        if whole_tree:
+            update_sync_status(
+                is_syncing=False,
+                processed_files=job.processed_files,
+                total_bytes=job.total_bytes,
+                last_completed_sync=job.started_at if job.failed_files == 0 else None,
+                throughput=throughput
+            )
+        elif throughput is not None:
+            update_sync_status(throughput=throughput)
+
+        add_log(f"同步完成，共处理 {job.processed_files} 个文件，传输总量: {format_size(job.total_bytes)}")
+        if job.failed_files:
+            raise RuntimeError(f"{job.failed_files} 个文件上传失败")
+    except JobSkipped:
+        raise
+    except Exception:
+        for future in pending_uploads:
+            future.cancel()
+        if whole_tree:
+            update_sync_status(is_syncing=False)
+        raise
+    finally:
+        if isinstance(bucket, AsyncBucket):
+            bucket.release()
+
+# 恢复路径下的OSS对象 (key, 大小)：与路径同名的单个文件，以及该目录下的所有文件
+def iter_restore_objects(bucket, prefix):
+    if prefix:
+        try:
+            meta = bucket.get_object_meta(prefix)
+        except oss2.exceptions.NotFound:
+            meta = None
+        if meta is not None:
+            yield prefix, meta.content_length
+        prefix += '/'
+    for obj in oss2.ObjectIterator(bucket, prefix=prefix):
+        yield obj.key, obj.size
+
+# 从OSS恢复文件到宿主机（只下载本地缺失或大小不一致的文件）
+def restore_from_oss_task(job):
+    auth, bucket = get_oss_client()
+    if not bucket:
+        raise RuntimeError("OSS客户端初始化失败")
+
+    host_dir = '/host_files'
+    prefix = job.path.strip('/')
+    add_log(f"开始恢复: OSS/{prefix} -> {host_dir}")
+
+    for key, size in iter_restore_objects(bucket, prefix):
+        if job.cancelled:
+            add_log("恢复任务被手动停止")
+            return
+        if key.endswith('/'):
+            continue
+
+        local_path = resolve_host_path(key)
+        if local_path is None:
+            add_log(f"跳过无效路径: {key}", "error")
+            continue
+
+        job.total_files += 1
+        if os.path.isfile(local_path) and os.path.getsize(local_path) == size:
+            job.processed_files += 1
+            continue
+
+        temp_path = local_path + RESTORE_TEMP_SUFFIX
+        try:
+            # 下载完成后再替换，避免留下不完整的文件
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            bucket.get_object_to_file(key, temp_path)
+            os.replace(temp_path, local_path)
+            job.total_bytes += size
+            add_log(f"恢复文件: {key}")
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            job.failed_files += 1
+            add_log(f"恢复文件 {key} 失败: {str(e)}", "error")
+        job.processed_files += 1
+
+    add_log(f"恢复完成，共处理 {job.processed_files} 个文件，传输总量: {format_size(job.total_bytes)}")
+    if job.failed_files:
+        raise RuntimeError(f"{job.failed_files} 个文件恢复失败")
+
+# 预演同步：扫描本地文件并与OSS比较，不上传任何文件
+def plan_sync(path='/'):
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+
+    auth, bucket = get_oss_client()
+    if not bucket:
+        raise RuntimeError("OSS客户端初始化失败")
+
+    host_dir = '/host_files'
+    base_dir = resolve_host_path(path)
+    if base_dir is None or not os.path.exists(base_dir):
+        raise FileNotFoundError(f"同步路径不存在: {path}")
+    ignore_patterns = config.get('ignore_patterns', [])
+
+    summary = {name: {'files': 0, 'bytes': 0} for name in ('new', 'changed', 'unchanged', 'remote_only')}
+    requests_estimate = {'list': 0, 'head': 0, 'put': 0, 'multipart_uploads': 0, 'multipart_parts': 0}
+
+    # 与真实同步使用同样的OSS列表和本地遍历，逐个文件比较，已匹配的key从列表中移除
+    prefix = get_remote_prefix(base_dir, host_dir)
+    remaining = list_remote_objects(bucket, prefix)
+    requests_estimate['list'] = max(1, math.ceil(len(remaining) / LIST_PAGE_SIZE))
+
+    for local_path, oss_key in iter_sync_files(base_dir, ignore_patterns, host_dir):
+        file_size = os.stat(local_path).st_size
+        remote_size = remaining.pop(oss_key, None)
+
+        if remote_size is None:
+            category = 'new'
+        else:
+            # 真实同步对已存在的文件会发起HEAD请求比较大小
+            requests_estimate['head'] += 1
+            category = 'unchanged' if remote_size == file_size else 'changed'
+        summary[category]['files'] += 1
+        summary[category]['bytes'] += file_size
+
+        if category != 'unchanged':
+            if file_size > MULTIPART_THRESHOLD:
+                requests_estimate['multipart_uploads'] += 1
+                requests_estimate['multipart_parts'] += math.ceil(file_size / MULTIPART_PART_SIZE)
+            else:
+                requests_estimate['put'] += 1
+
+    for size in remaining.values():
+        summary['remote_only']['files'] += 1
+        summary['remote_only']['bytes'] += size
+
+    # 分片上传每个文件额外需要初始化和完成两次请求
+    requests_estimate['total'] = (
+        requests_estimate['list'] + requests_estimate['head'] + requests_estimate['put']
+        + requests_estimate['multipart_parts'] + 2 * requests_estimate['multipart_uploads']
+    )
+
+    # 根据当前传输后端最近同步任务的整体测量值估算耗时
+    upload_bytes = summary['new']['bytes'] + summary['changed']['bytes']
+    try:
+        backend = parse_transfer_config(config.get('transfer', {}))['backend']
+    except ValueError:
+        backend = 'threaded'
+    model = fit_throughput_model(backend)
+    estimated_seconds = estimate_duration(model, upload_bytes, requests_estimate['total'])
+
+    return {
+        'path': '/' + path.strip('/'),
+        'summary': summary,
+        'upload_bytes': upload_bytes,
+        'requests': requests_estimate,
+        'throughput': dict(model, backend=backend),
+        'estimated_seconds': estimated_seconds
+    }
+
+# 获取上次所有文件都上传成功的全量扫描同步的开始时间
+def get_last_completed_sync():
+    try:
+        with open(status_file, 'r') as f:
+            status = json.load(f)
+        return status.get('last_completed_sync')
+    except (json.JSONDecodeError, FileNotFoundError):
+        return None
 
 # 启动同步任务
-def start_sync_task():
+def start_sync_task(job_type='full', path='/', source='manual'):
     try:
-        # 将任务添加到队列
-        sync_queue.put("SYNC")
+        # 将任务添加到调度器
+        priority = JOB_PRIORITIES[job_type]
+        if source == 'schedule':
+            priority += SCHEDULED_PRIORITY_PENALTY
+        return job_scheduler.submit(job_type, path, priority, source)
     except Exception as e:
         add_log(f"启动同步任务失败: {str(e)}", "error")
+        return None, False
 
-# 启动工作线程
-sync_thread = threading.Thread(target=sync_worker, daemon=True)
-sync_thread.start()
+# 启动工作线程池
+def get_worker_count():
+    try:
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+        return int(config.get('workers', 2))
+    except (json.JSONDecodeError, FileNotFoundError, ValueError):
+        return 2
+
+load_throughput_stats()
+
+job_scheduler = JobScheduler(run_sync_job)
+job_scheduler.start(get_worker_count())
 
 # 创建定时任务调度器
 scheduler = BackgroundScheduler()
@@ -490,10 +1106,14 @@ def setup_scheduler():
         
         if config.get('schedule', {}).get('enabled', False):
             interval = config.get('schedule', {}).get('interval', 3600)
+            job_type = config.get('schedule', {}).get('type', 'full')
+            if job_type not in WHOLE_TREE_JOBS:
+                job_type = 'full'
             scheduler.add_job(
                 start_sync_task, 
                 'interval', 
                 seconds=interval,
+                kwargs={'job_type': job_type, 'source': 'schedule'},
                 id='sync_job'
             )
             add_log(f"已设置定时同步任务，间隔 {interval} 秒")
@@ -554,6 +1174,11 @@ def update_config():
             config['schedule'] = new_config['schedule']
         if 'ignore_patterns' in new_config:
             config['ignore_patterns'] = new_config['ignore_patterns']
+        if 'transfer' in new_config:
+            try:
+                config['transfer'] = parse_transfer_config(new_config['transfer'])
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
         
         with open(config_file, 'w') as f:
             json.dump(config, f)
@@ -588,6 +1213,10 @@ def start_sync():
         if status.get('is_syncing'):
             return jsonify({'success': False, 'message': '同步任务已在进行中'}), 400
         
+        job_type = (request.get_json(silent=True) or {}).get('type', 'full')
+        if job_type not in WHOLE_TREE_JOBS:
+            return jsonify({'success': False, 'message': '无效的同步类型'}), 400
+        
         with open(config_file, 'r') as f:
             config = json.load(f)
         
@@ -599,13 +1228,77 @@ def start_sync():
         add_log("同步任务已开始")
         
         # 启动异步同步任务
-        start_sync_task()
+        job, created = start_sync_task(job_type)
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'job': job.to_dict() if job else None})
     except Exception as e:
         add_log(f"开始同步失败: {str(e)}", "error")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 路由：立即同步指定路径（优先于后台全量同步执行）
+@app.route('/api/sync/path', methods=['POST'])
+def sync_path():
+    try:
+        path = (request.get_json(silent=True) or {}).get('path', '/')
+        full_path = resolve_host_path(path)
+        if full_path is None:
+            return jsonify({'success': False, 'message': '无效的路径'}), 400
+        if not os.path.exists(full_path):
+            return jsonify({'success': False, 'message': '路径不存在'}), 404
+        
+        job, created = start_sync_task('path', path)
+        if not job:
+            return jsonify({'success': False, 'message': '创建同步任务失败'}), 500
+        
+        add_log(f"已提交路径同步任务: {job.path}" if created else f"路径同步任务已在队列中: {job.path}")
+        return jsonify({'success': True, 'created': created, 'job': job.to_dict()})
+    except Exception as e:
+        add_log(f"提交路径同步任务失败: {str(e)}", "error")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 路由：从OSS恢复指定路径
+@app.route('/api/sync/restore', methods=['POST'])
+def restore_path():
+    try:
+        path = (request.get_json(silent=True) or {}).get('path', '/')
+        if resolve_host_path(path) is None:
+            return jsonify({'success': False, 'message': '无效的路径'}), 400
+        
+        job, created = start_sync_task('restore', path)
+        if not job:
+            return jsonify({'success': False, 'message': '创建恢复任务失败'}), 500
+        
+        add_log(f"已提交恢复任务: {job.path}" if created else f"恢复任务已在队列中: {job.path}")
+        return jsonify({'success': True, 'created': created, 'job': job.to_dict()})
+    except Exception as e:
+        add_log(f"提交恢复任务失败: {str(e)}", "error")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 路由：预演同步，返回需要上传的文件数量、请求数和预计耗时
+@app.route('/api/sync/plan', methods=['GET'])
+def get_sync_plan():
+    try:
+        path = request.args.get('path', '/')
+        if resolve_host_path(path) is None:
+            return jsonify({'error': '无效的路径'}), 400
+        
+        plan = plan_sync(path)
+        add_log(f"同步预演完成: {plan['path']}，需上传 {plan['summary']['new']['files'] + plan['summary']['changed']['files']} 个文件")
+        return jsonify(plan)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        add_log(f"同步预演失败: {str(e)}", "error")
+        return jsonify({'error': str(e)}), 500
+
+# 路由：获取任务队列
+@app.route('/api/sync/jobs', methods=['GET'])
+def get_sync_jobs():
+    try:
+        return jsonify(job_scheduler.snapshot())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # 路由：停止同步
 @app.route('/api/sync/stop', methods=['POST'])
 def stop_sync():
@@ -618,6 +1311,9 @@ def stop_sync():
         with open(config_file, 'w') as f:
             json.dump(config, f)
         
+        # 取消排队和运行中的任务
+        job_scheduler.cancel_all()
+        
         add_log("同步任务已停止")
         return jsonify({'success': True})
     except Exception as e:
@@ -669,10 +1365,10 @@ def reset_sync_status():
 def list_files():
     try:
         path = request.args.get('path', '/')
-        full_path = os.path.normpath(os.path.join('/host_files', path.lstrip('/')))
+        full_path = resolve_host_path(path)
         
         # 安全检查，确保路径在/host_files下
-        if not full_path.startswith('/host_files'):
+        if full_path is None:
             return jsonify({'error': '无效的路径'}), 400
         
         if not os.path.exists(full_path):
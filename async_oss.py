@@ -0,0 +1,372 @@
+import asyncio
+import base64
+import concurrent.futures
+import datetime
+import hashlib
+import hmac
+import ipaddress
+import mimetypes
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from urllib.parse import quote, urlsplit
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:  # 未安装aiohttp时只能使用线程传输后端
+    aiohttp = None
+    yarl = None
+
+# 参与V1签名的子资源
+SUB_RESOURCES = ('partNumber', 'uploadId', 'uploads')
+
+
+class AsyncOSSError(Exception):
+    def __init__(self, status, code, message, request_id=None):
+        super().__init__(f"{status} {code}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+        self.request_id = request_id
+
+
+# 与oss2返回结果保持相同的属性名
+class PutResult:
+    def __init__(self, status, headers):
+        self.status = status
+        self.headers = headers
+        self.etag = headers.get('ETag', '').strip('"')
+        self.request_id = headers.get('x-oss-request-id')
+
+
+class InitMultipartUploadResult:
+    def __init__(self, status, headers, upload_id):
+        self.status = status
+        self.headers = headers
+        self.upload_id = upload_id
+        self.request_id = headers.get('x-oss-request-id')
+
+
+# 从endpoint推断地域，如 oss-cn-hangzhou.aliyuncs.com -> cn-hangzhou
+def region_from_endpoint(endpoint):
+    host = urlsplit(endpoint if '://' in endpoint else 'http://' + endpoint).hostname or ''
+    match = re.match(r'oss-([a-z0-9-]+?)(-internal)?\.aliyuncs\.com$', host)
+    return match.group(1) if match else None
+
+
+def is_ip_or_localhost(host):
+    if host == 'localhost':
+        return True
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+# OSS请求签名（V1: HMAC-SHA1，V4: OSS4-HMAC-SHA256）
+class OSSSigner:
+    def __init__(self, access_key_id, access_key_secret, bucket_name, version='v1', region=None):
+        if version not in ('v1', 'v4'):
+            raise ValueError(f"不支持的签名版本: {version}")
+        if version == 'v4' and not region:
+            raise ValueError("V4签名需要指定地域")
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.bucket_name = bucket_name
+        self.version = version
+        self.region = region
+
+    # 为请求添加签名头，params为查询参数（值为None表示无值子资源）
+    def sign(self, method, key, params, headers, now=None):
+        now = now or time.time()
+        if self.version == 'v4':
+            self._sign_v4(method, key, params, headers, now)
+        else:
+            self._sign_v1(method, key, params, headers, now)
+        return headers
+
+    def _sign_v1(self, method, key, params, headers, now):
+        headers['Date'] = formatdate(now, usegmt=True)
+        lower = {k.lower(): str(v).strip() for k, v in headers.items()}
+        oss_headers = ''.join(
+            f"{k}:{lower[k]}\n" for k in sorted(lower) if k.startswith('x-oss-')
+        )
+
+        resource = f"/{self.bucket_name}/{key}"
+        sub = sorted(k for k in params if k in SUB_RESOURCES)
+        if sub:
+            resource += '?' + '&'.join(
+                k if params[k] is None else f"{k}={params[k]}" for k in sub
+            )
+
+        string_to_sign = '\n'.join([
+            method,
+            lower.get('content-md5', ''),
+            lower.get('content-type', ''),
+            headers['Date'],
+            oss_headers + resource
+        ])
+        digest = hmac.new(self.access_key_secret.encode(), string_to_sign.encode(), hashlib.sha1).digest()
+        headers['Authorization'] = f"OSS {self.access_key_id}:{base64.b64encode(digest).decode()}"
+
+    def _sign_v4(self, method, key, params, headers, now):
+        moment = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+        timestamp = moment.strftime('%Y%m%dT%H%M%SZ')
+        date = moment.strftime('%Y%m%d')
+        headers['x-oss-date'] = timestamp
+        headers['x-oss-content-sha256'] = 'UNSIGNED-PAYLOAD'
+
+        lower = {k.lower(): str(v).strip() for k, v in headers.items()}
+        signed = sorted(
+            k for k in lower if k.startswith('x-oss-') or k in ('content-type', 'content-md5')
+        )
+        canonical_headers = ''.join(f"{k}:{lower[k]}\n" for k in signed)
+        canonical_query = '&'.join(
+            quote(k, safe='-_.~') if params[k] is None
+            else f"{quote(k, safe='-_.~')}={quote(str(params[k]), safe='-_.~')}"
+            for k in sorted(params)
+        )
+        canonical_request = '\n'.join([
+            method,
+            '/' + quote(f"{self.bucket_name}/{key}", safe='/-_.~'),
+            canonical_query,
+            canonical_headers,
+            '',
+            'UNSIGNED-PAYLOAD'
+        ])
+
+        scope = f"{date}/{self.region}/oss/aliyun_v4_request"
+        string_to_sign = '\n'.join([
+            'OSS4-HMAC-SHA256',
+            timestamp,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+
+        signing_key = ('aliyun_v4' + self.access_key_secret).encode()
+        for part in (date, self.region, 'oss', 'aliyun_v4_request'):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        headers['Authorization'] = (
+            f"OSS4-HMAC-SHA256 Credential={self.access_key_id}/{scope}, Signature={signature}"
+        )
+
+
+# 基于asyncio和aiohttp的传输后端，在后台线程中运行事件循环
+class AsyncOSSBackend:
+    def __init__(self, access_key_id, access_key_secret, endpoint, bucket_name,
+                 concurrency=256, signature_version='v1', region=None, timeout=300,
+                 max_pending_bytes=64 * 1024 * 1024):
+        if aiohttp is None:
+            raise RuntimeError("异步传输后端需要安装aiohttp")
+        if concurrency < 1 or max_pending_bytes < 1:
+            raise ValueError("并发请求数和排队数据上限必须大于0")
+
+        parts = urlsplit(endpoint if '://' in endpoint else 'http://' + endpoint)
+        if is_ip_or_localhost(parts.hostname):
+            # 与oss2一致，IP或localhost使用路径形式访问bucket
+            self.base_url = f"{parts.scheme}://{parts.netloc}/{bucket_name}"
+        else:
+            self.base_url = f"{parts.scheme}://{bucket_name}.{parts.netloc}"
+        self.signer = OSSSigner(
+            access_key_id, access_key_secret, bucket_name, signature_version,
+            region or region_from_endpoint(endpoint)
+        )
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        # 已提交未完成的任务数和字节数上限，避免调用方一次性提交过多文件占用内存
+        self.max_pending_files = concurrency * 2
+        self.max_pending_bytes = max_pending_bytes
+        self._pending_cond = threading.Condition()
+        self._pending_files = 0
+        self._pending_bytes = 0
+        self._users = 0
+        self._retired = False
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='oss-async-loop', daemon=True)
+        self._thread.start()
+        self._run(self._setup()).result()
+
+    async def _setup(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _request(self, method, key, params=None, headers=None, data=None):
+        params = params or {}
+        headers = dict(headers or {})
+
+        url = f"{self.base_url}/{quote(key, safe='/')}"
+        if params:
+            url += '?' + '&'.join(
+                quote(k, safe='') if v is None else f"{quote(k, safe='')}={quote(str(v), safe='')}"
+                for k, v in sorted(params.items())
+            )
+
+        async with self._semaphore:
+            if callable(data):
+                data = await self._loop.run_in_executor(None, data)
+            # 获得并发许可后再签名，避免排队过久导致请求时间过期
+            self.signer.sign(method, key, params, headers)
+            async with self._session.request(
+                method, yarl.URL(url, encoded=True), headers=headers, data=data,
+                skip_auto_headers=('Content-Type',)
+            ) as resp:
+                body = await resp.read()
+                if resp.status // 100 != 2:
+                    raise self._make_error(resp, body)
+                return resp.status, resp.headers, body
+
+    @staticmethod
+    def _make_error(resp, body):
+        code, message = '', body.decode(errors='replace')
+        try:
+            root = ET.fromstring(body)
+            code = root.findtext('Code', '')
+            message = root.findtext('Message', message)
+        except ET.ParseError:
+            pass
+        return AsyncOSSError(resp.status, code, message, resp.headers.get('x-oss-request-id'))
+
+    @staticmethod
+    def _content_type(key):
+        return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+    async def put_object_async(self, key, data):
+        status, headers, _ = await self._request(
+            'PUT', key, headers={'Content-Type': self._content_type(key)}, data=data
+        )
+        return PutResult(status, headers)
+
+    async def init_multipart_upload_async(self, key):
+        status, headers, body = await self._request(
+            'POST', key, params={'uploads': None},
+            headers={'Content-Type': self._content_type(key)}
+        )
+        return InitMultipartUploadResult(status, headers, ET.fromstring(body).findtext('UploadId'))
+
+    async def upload_part_async(self, key, upload_id, part_number, data):
+        status, headers, _ = await self._request(
+            'PUT', key, params={'partNumber': part_number, 'uploadId': upload_id}, data=data
+        )
+        return PutResult(status, headers)
+
+    async def complete_multipart_upload_async(self, key, upload_id, parts):
+        root = ET.Element('CompleteMultipartUpload')
+        for part in sorted(parts, key=lambda p: p.part_number):
+            node = ET.SubElement(root, 'Part')
+            ET.SubElement(node, 'PartNumber').text = str(part.part_number)
+            ET.SubElement(node, 'ETag').text = f'"{part.etag}"'
+        status, headers, _ = await self._request(
+            'POST', key, params={'uploadId': upload_id},
+            headers={'Content-Type': 'application/xml'}, data=ET.tostring(root)
+        )
+        return PutResult(status, headers)
+
+    # 提交小文件上传，立即返回concurrent.futures.Future；排队过多时阻塞调用方
+    # 超过字节上限时阻塞调用方；单个文件超过上限时等到没有其他排队任务再提交
+    def submit_put_file(self, key, local_path, size=None):
+        if size is None:
+            size = os.path.getsize(local_path)
+
+        with self._pending_cond:
+            while self._pending_files and (
+                self._pending_files >= self.max_pending_files
+                or self._pending_bytes + size > self.max_pending_bytes
+            ):
+                self._pending_cond.wait()
+            self._pending_files += 1
+            self._pending_bytes += size
+
+        def release(_):
+            with self._pending_cond:
+                self._pending_files -= 1
+                self._pending_bytes -= size
+                self._pending_cond.notify_all()
+
+        def read_file():
+            with open(local_path, 'rb') as f:
+                return f.read()
+
+        future = self._run(self.put_object_async(key, read_file))
+        future.add_done_callback(release)
+        return future
+
+    # 使用计数：被新配置替换的后端在最后一个使用者释放后关闭
+    def acquire(self):
+        with self._pending_cond:
+            self._users += 1
+
+    def release(self):
+        with self._pending_cond:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self):
+        with self._pending_cond:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    def close(self):
+        with self._pending_cond:
+            if self._closed:
+                return
+            self._closed = True
+        self._run(self._session.close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# 与oss2.Bucket接口兼容的包装：上传类请求走异步后端，其余请求仍由oss2处理
+class AsyncBucket:
+    def __init__(self, bucket, backend):
+        self._bucket = bucket
+        self.backend = backend
+
+    def put_object(self, key, data):
+        if hasattr(data, 'read'):
+            data = data.read()
+        return self.backend._run(self.backend.put_object_async(key, data)).result()
+
+    def init_multipart_upload(self, key):
+        return self.backend._run(self.backend.init_multipart_upload_async(key)).result()
+
+    def upload_part(self, key, upload_id, part_number, data):
+        return self.backend._run(self.backend.upload_part_async(key, upload_id, part_number, data)).result()
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        return self.backend._run(self.backend.complete_multipart_upload_async(key, upload_id, parts)).result()
+
+    def submit_put_file(self, key, local_path, size=None):
+        return self.backend.submit_put_file(key, local_path, size)
+
+    def release(self):
+        self.backend.release()
+
+    def __getattr__(self, attr):
+        return getattr(self._bucket, attr)
+
+
+# 等待一批上传完成，返回 (成功数, 失败列表)
+def wait_uploads(futures):
+    done, _ = concurrent.futures.wait(futures)
+    failed = [f.exception() for f in done if f.exception() is not None]
+    return len(done) - len(failed), failed
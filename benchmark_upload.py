@@ -0,0 +1,124 @@
+"""小文件上传性能对比：应用的线程传输路径 vs oss2线程池 vs asyncio异步传输后端
+
+- serial: 同一个同步任务中逐个调用 oss_upload.upload_file，即线程传输后端的实际上传方式
+- threadpool: 多个线程并发调用 oss2 put_object，作为参考
+- async: 异步传输后端，提交后不等待结果
+
+使用与应用相同的OSS环境变量，上传到 benchmark/ 前缀下，结束后删除测试文件：
+
+    python benchmark_upload.py --files 2000 --size 4096 --threads 32 --concurrency 512
+"""
+import argparse
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import time
+
+import oss2
+
+from async_oss import AsyncOSSBackend, wait_uploads
+from oss_upload import upload_file
+
+
+def make_files(directory, count, size):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'{i:06d}.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def bench_serial(bucket, paths, prefix):
+    start = time.time()
+    failed = 0
+    for path in paths:
+        try:
+            upload_file(bucket, path, prefix + os.path.basename(path), os.path.getsize(path))
+        except Exception:
+            failed += 1
+    return time.time() - start, failed
+
+
+def bench_threadpool(bucket, paths, prefix, threads):
+    def upload(path):
+        with open(path, 'rb') as f:
+            bucket.put_object(prefix + os.path.basename(path), f)
+
+    start = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(upload, path) for path in paths]
+    done, _ = concurrent.futures.wait(futures)
+    failed = sum(1 for f in done if f.exception() is not None)
+    return time.time() - start, failed
+
+
+def bench_async(backend, paths, prefix):
+    start = time.time()
+    futures = [
+        backend.submit_put_file(prefix + os.path.basename(path), path, os.path.getsize(path))
+        for path in paths
+    ]
+    _, failed = wait_uploads(futures)
+    return time.time() - start, len(failed)
+
+
+def cleanup(bucket, prefix):
+    keys = [obj.key for obj in oss2.ObjectIterator(bucket, prefix=prefix)]
+    for i in range(0, len(keys), 1000):
+        bucket.batch_delete_objects(keys[i:i + 1000])
+
+
+def report(name, paths, size, elapsed, failed):
+    total = len(paths) * size
+    print(f"{name:<16} {elapsed:8.2f}s  {len(paths) / elapsed:10.1f} 文件/秒  "
+          f"{total / elapsed / 1024 / 1024:8.2f} MB/秒  失败 {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比线程与异步传输后端的小文件上传性能')
+    parser.add_argument('--files', type=int, default=1000, help='测试文件数量')
+    parser.add_argument('--size', type=int, default=4096, help='单个文件大小（字节）')
+    parser.add_argument('--threads', type=int, default=32, help='线程池对照组的线程数')
+    parser.add_argument('--concurrency', type=int, default=256, help='异步后端的并发请求数')
+    parser.add_argument('--signature', choices=('v1', 'v4'), default='v1', help='异步后端的签名版本')
+    parser.add_argument('--keep', action='store_true', help='保留上传的测试文件')
+    args = parser.parse_args()
+
+    access_key_id = os.environ['OSS_ACCESS_KEY_ID']
+    access_key_secret = os.environ['OSS_ACCESS_KEY_SECRET']
+    bucket_name = os.environ['OSS_BUCKET']
+    endpoint = os.environ['OSS_ENDPOINT']
+
+    bucket = oss2.Bucket(oss2.Auth(access_key_id, access_key_secret), endpoint, bucket_name)
+    backend = AsyncOSSBackend(
+        access_key_id, access_key_secret, endpoint, bucket_name,
+        concurrency=args.concurrency, signature_version=args.signature,
+        region=os.environ.get('OSS_REGION')
+    )
+
+    directory = tempfile.mkdtemp(prefix='oss-bench-')
+    prefix = f"benchmark/{int(time.time())}/"
+    try:
+        paths = make_files(directory, args.files, args.size)
+        print(f"{args.files} 个文件，每个 {args.size} 字节")
+
+        elapsed, failed = bench_serial(bucket, paths, prefix + 'serial/')
+        report('serial', paths, args.size, elapsed, failed)
+
+        elapsed, failed = bench_threadpool(bucket, paths, prefix + 'threadpool/', args.threads)
+        report(f'threadpool({args.threads})', paths, args.size, elapsed, failed)
+
+        elapsed, failed = bench_async(backend, paths, prefix + 'async/')
+        report(f'async({args.concurrency})', paths, args.size, elapsed, failed)
+    finally:
+        backend.close()
+        shutil.rmtree(directory, ignore_errors=True)
+        if not args.keep:
+            cleanup(bucket, prefix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""oss2同步上传，不依赖应用状态，供 app.py 和性能对比脚本共用"""
+import math
+import time
+
+import oss2
+
+# 超过该大小的文件使用分片上传
+MULTIPART_THRESHOLD = 10 * 1024 * 1024
+# 分片大小
+MULTIPART_PART_SIZE = 5 * 1024 * 1024
+
+
+def _no_log(message):
+    pass
+
+
+# 格式化大小
+def format_size(bytes, suffix="B"):
+    if bytes == 0:
+        return "0 " + suffix
+    size_name = ("", "K", "M", "G", "T", "P", "E", "Z", "Y")
+    i = int(math.floor(math.log(bytes, 1024)))
+    p = math.pow(1024, i)
+    s = round(bytes / p, 2)
+    return f"{s} {size_name[i]}{suffix}"
+
+
+# 上传单个文件，on_progress(本次传输字节数, 速度)，log(消息) 记录上传过程
+def upload_file(bucket, local_path, oss_key, file_size, on_progress=None, log=_no_log):
+    # 使用分片上传来处理大文件
+    if file_size > MULTIPART_THRESHOLD:
+        log(f"开始分片上传大文件: {oss_key}")
+
+        # 初始化分片上传
+        upload_id = bucket.init_multipart_upload(oss_key).upload_id
+        parts = []
+
+        part_size = MULTIPART_PART_SIZE
+        num_parts = (file_size + part_size - 1) // part_size
+
+        with open(local_path, 'rb') as f:
+            for i in range(num_parts):
+                # 记录开始时间
+                start_time = time.time()
+
+                # 读取分片数据
+                data = f.read(part_size)
+                part_bytes = len(data)
+
+                # 上传分片
+                result = bucket.upload_part(oss_key, upload_id, i + 1, data)
+                parts.append(oss2.models.PartInfo(i + 1, result.etag))
+
+                # 记录结束时间并计算速度
+                elapsed = time.time() - start_time
+                if elapsed > 0:
+                    speed = part_bytes / elapsed
+                    if on_progress:
+                        on_progress(part_bytes, speed)
+
+                    # 记录日志
+                    formatted_speed = format_size(speed) + "/s"
+                    progress = (i + 1) / num_parts * 100
+                    log(f"分片上传 {oss_key} 进度: {progress:.1f}%, 速度: {formatted_speed}")
+
+        # 完成分片上传
+        bucket.complete_multipart_upload(oss_key, upload_id, parts)
+        log(f"完成分片上传: {oss_key}")
+    else:
+        # 小文件上传 - 使用简单方法而不是带宽监控
+        with open(local_path, 'rb') as f:
+            # 记录开始时间
+            start_time = time.time()
+
+            # 直接上传文件
+            bucket.put_object(oss_key, f)
+
+            # 记录结束时间并计算速度
+            elapsed = time.time() - start_time
+            if elapsed > 0 and on_progress:
+                on_progress(file_size, file_size / elapsed)
+
+        log(f"上传文件: {oss_key}")